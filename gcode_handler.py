@@ -1,5 +1,8 @@
 import os
 
+# Parameters used from G0/G1/G92 lines, mapped from either case to their upper case letter
+_PARAM_CODES = {'X': 'X', 'Y': 'Y', 'Z': 'Z', 'E': 'E', 'x': 'X', 'y': 'Y', 'z': 'Z', 'e': 'E'}
+
 class GCodeProcessor:
     """
     Handles finding G-code files and parsing actionable commands (G0, G1)
@@ -17,6 +20,16 @@ class GCodeProcessor:
     LOG_INFO = 1
     LOG_DEBUG = 2
 
+    # Define command codes
+    # Commands are returned as small integers, which are cheaper to compare than strings
+    CMD_G0 = 0
+    CMD_G1 = 1
+    CMD_G92 = 2
+
+    # Resolution of the extrusion tracking (slicers write E values with at most 5 decimals)
+    E_DECIMALS = 5
+    E_UNITS_PER_MM = 10 ** E_DECIMALS
+
     def __init__(self, models_subdir: str = 'models', gcode_extension: str = '.gcode', verbose: int = 1):
         """
         Initializes the GCodeProcessor. Verifies the 'models' directory exists.
@@ -34,7 +47,12 @@ class GCodeProcessor:
         self.verbose = verbose
 
         # Initial state for extrusion tracking
-        self.last_e_value = 0.0
+        # E values are tracked as integers in units of E_UNITS_PER_MM, so no floats are created for them
+        self.last_e_value = 0
+
+        # Cache of os.stat results, keyed by path (None for paths that could not be accessed)
+        # The models directory does not change during a print, so the cache lives as long as the processor
+        self._stat_cache = {}
 
         # Debugging output
         self._log(GCodeProcessor.LOG_DEBUG, "Looking for '{}' files in subdirectory: '{}' (relative to CWD)".format(self.gcode_extension, self.models_dir))
@@ -58,26 +76,59 @@ class GCodeProcessor:
         if self.verbose >= level:
             print(message)
 
-    def _is_directory(self, path):
-        """Checks if a path points to a directory using os.stat."""
+    def _cached_stat(self, path):
+        """Returns the os.stat result for a path, or None if it cannot be accessed. Results are cached per path."""
+
+        # Return the cached result if this path was checked before
+        if path in self._stat_cache: return self._stat_cache[path]
+
+        # Otherwise stat the path once and remember the result (also when it fails)
         try:
             stat_info = os.stat(path)
-            return (stat_info[0] & 0o170000) == 0o040000
         except OSError as e:
             self._log(GCodeProcessor.LOG_ERROR, "Error accessing path '{}': {}".format(path, e))
-            return False
+            stat_info = None
+        self._stat_cache[path] = stat_info
+        return stat_info
+
+    def _is_directory(self, path):
+        """Checks if a path points to a directory using os.stat."""
+        stat_info = self._cached_stat(path)
+        if stat_info is None: return False
+        return (stat_info[0] & 0o170000) == 0o040000
 
     def _is_file(self, path):
         """Checks if a path points to a regular file using os.stat."""
-        try:
-            stat_info = os.stat(path)
-            is_file = (stat_info[0] & 0o170000) == 0o100000
-            if not is_file:
-               self._log(GCodeProcessor.LOG_DEBUG, "Debug: Path '{}' exists but is not a regular file.".format(path))
-            return is_file
-        except OSError as e:
-            self._log(GCodeProcessor.LOG_ERROR, "Error accessing path '{}' to check file status: {}".format(path, e))
-            return False
+        stat_info = self._cached_stat(path)
+        if stat_info is None: return False
+        is_file = (stat_info[0] & 0o170000) == 0o100000
+        if not is_file:
+           self._log(GCodeProcessor.LOG_DEBUG, "Debug: Path '{}' exists but is not a regular file.".format(path))
+        return is_file
+
+    def _scan_directory(self, path):
+        """
+        Yields (name, is_file) for every entry in a directory.
+        Uses os.scandir where available, falling back to os.ilistdir on MicroPython.
+        Both report the entry type from the directory listing, avoiding an os.stat per entry.
+        """
+        # CPython: DirEntry caches the type reported by readdir
+        if hasattr(os, 'scandir'):
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    yield entry.name, entry.is_file(follow_symlinks=False)
+
+        # MicroPython: ilistdir yields (name, type, inode[, size]) tuples
+        else:
+            for entry in os.ilistdir(path):
+                name, entry_type = entry[0], entry[1]
+
+                # Some file systems do not report the type (0), so only then fall back to os.stat
+                if entry_type == 0:
+                    full_path = name if path == '.' else path + '/' + name
+                    yield name, self._is_file(full_path)
+                else:
+                    yield name, entry_type == 0o100000
 
     def find_gcode_files(self):
         """Scans the 'models' subdirectory for files with the .gcode extension."""
@@ -86,25 +137,24 @@ class GCodeProcessor:
         if not self.models_dir_valid: return []
 
         # Start with an empty list of G-code files
+        # Debug messages are only formatted if they will be printed
         gcode_files = []
+        debug = self.verbose >= GCodeProcessor.LOG_DEBUG
         self._log(GCodeProcessor.LOG_DEBUG, "Scanning directory: {}...".format(self.models_dir))
 
         # Attempt to list files in the models directory
         try:
-            items = os.listdir(self.models_dir)
-            self._log(GCodeProcessor.LOG_DEBUG, "Items found: {}".format(items))
+            # Go over every entry in the directory
+            # The entry type comes from the directory listing itself, so no extra os.stat is needed per entry
+            for item, is_file in self._scan_directory(self.models_dir):
 
-            # Go over every file in the directory
-            for item in items:
-                full_path = item if self.models_dir == '.' else self.models_dir + '/' + item
-                
                 # Check if the item ends with the G-code extension and is a valid file
-                if item.lower().endswith(self.gcode_extension) and self._is_file(full_path):
-                    self._log(GCodeProcessor.LOG_DEBUG, "  -> Match found: {}".format(item))
+                if item.lower().endswith(self.gcode_extension) and is_file:
+                    if debug: self._log(GCodeProcessor.LOG_DEBUG, "  -> Match found: {}".format(item))
 
                     # If it is a valid G-code file, add it to the list
                     gcode_files.append(item)
-        
+
         # Handle any errors that occur during directory scanning
         except OSError as e:
             self._log(GCodeProcessor.LOG_ERROR, "Error scanning directory '{}': {}".format(self.models_dir, e))
@@ -117,6 +167,52 @@ class GCodeProcessor:
         # Return the list of G-code files found
         return gcode_files
 
+    @staticmethod
+    def _e_to_units(value):
+        """
+        Converts the text of an E value to an integer number of E units (see E_UNITS_PER_MM).
+        Decimals beyond the resolution are truncated. Values in exponent notation fall back to float().
+
+        Args:
+            value (str): The number following the 'E' in a G-code parameter, e.g. '12.34567'.
+
+        Returns:
+            int: The E value in E units.
+
+        Raises:
+            ValueError: If the text is not a valid number.
+        """
+        # Handle the sign separately, so the integer and fractional parts can be combined
+        negative = value[0] == '-'
+        digits = value[1:] if negative or value[0] == '+' else value
+
+        # Split into integer and fractional parts, keeping E_DECIMALS decimals
+        # Both parts must be plain digits, as int() would also accept another sign
+        units_per_mm = GCodeProcessor.E_UNITS_PER_MM
+        decimals = GCodeProcessor.E_DECIMALS
+        dot = digits.find('.')
+        try:
+            if dot < 0:
+                if not digits.isdigit(): raise ValueError("could not convert string to E value: '{}'".format(value))
+                units = int(digits) * units_per_mm
+            else:
+                int_part = digits[:dot]
+                fraction = digits[dot + 1:dot + 1 + decimals]
+                if (int_part and not int_part.isdigit()) or (fraction and not fraction.isdigit()) or not (int_part or fraction):
+                    raise ValueError("could not convert string to E value: '{}'".format(value))
+                units = int(int_part) * units_per_mm if int_part else 0
+                if fraction: units += int(fraction) * 10 ** (decimals - len(fraction))
+
+        # Anything else (e.g. '1e-3') is left to float()
+        # Values that do not fit an integer (e.g. 'inf') are reported as parse errors
+        except ValueError:
+            try:
+                return int(float(value) * GCodeProcessor.E_UNITS_PER_MM)
+            except OverflowError:
+                raise ValueError("could not convert string to E value: '{}'".format(value))
+
+        return -units if negative else units
+
     def parse_line(self, gcode_line, line_number: int = 0):
         """
         Parses a single line of G-code, returning actionable commands (G0, G1).
@@ -128,108 +224,142 @@ class GCodeProcessor:
             line_number (int): The line number in the G-code file (for logging). Defaults to 0.
 
         Returns:
-            dict: A dictionary describing the command if it's G0 or G1.
-                  The dictionary contains:
-                  - 'command': The G-code command ('G0' or 'G1').
-                  - 'extruding': A boolean indicating if extrusion is happening (True/False).
-                  - 'x': The X coordinate (if present).
-                  - 'y': The Y coordinate (if present).
-                  - 'z': The Z coordinate (if present).
-                  The dictionary may look like:
-                      {'command': str, 'extruding': Bool, 'x': float?, 'y': float?, 'z': float?}
+            tuple: A tuple describing the command if it's G0 or G1.
+                   The tuple contains, in order:
+                   - command: The G-code command (GCodeProcessor.CMD_G0 or CMD_G1).
+                   - extruding: A boolean indicating if extrusion is happening (True/False).
+                   - x: The X coordinate, or None if not present.
+                   - y: The Y coordinate, or None if not present.
+                   - z: The Z coordinate, or None if not present.
+                   The tuple may look like:
+                       (int, Bool, float?, float?, float?)
             None: If the line is empty, a comment, G92, or any other unhandled command.
         """
 
-        # Debugging output
-        self._log(GCodeProcessor.LOG_DEBUG, "Parsing line: '{}'".format(gcode_line.strip()))
+        # Reject empty lines and comment-only lines from their first character
+        # Slicers emit many of these, so this avoids splitting and stripping them
+        # Lines starting with other whitespace may still be indented commands and are handled below
+        if not gcode_line or gcode_line[0] in ';\r\n': return None
+
+        # Clean the line and ignore empty lines or comments
+        cleaned_line = GCodeProcessor.clean_line(gcode_line)
+        if not cleaned_line: return None
+
+        # Parse the cleaned line
+        return self.parse_command(cleaned_line, line_number)
 
-        # Clean the line and check for empty lines/comments
+    @staticmethod
+    def clean_line(gcode_line):
+        """
+        Removes the comment and surrounding whitespace from a line of G-code.
+
+        Args:
+            gcode_line (str): The raw line of text from the G-code file.
+
+        Returns:
+            str: The cleaned line, which is empty if the line was blank or only a comment.
+        """
         if ';' in gcode_line: gcode_line = gcode_line.split(';', 1)[0]
-        cleaned_line = gcode_line.strip()
+        return gcode_line.strip()
 
-        # Ignore empty lines or comments
-        if not cleaned_line: return None
+    def parse_command(self, cleaned_line, line_number: int = 0):
+        """
+        Parses a line of G-code that has already been cleaned with clean_line.
+        This skips the comment and whitespace handling of parse_line, for callers that filter lines themselves.
+
+        Args:
+            cleaned_line (str): A non-empty line of G-code without comment or surrounding whitespace.
+            line_number (int): The line number in the G-code file (for logging). Defaults to 0.
+
+        Returns:
+            tuple: A tuple describing the command if it's G0 or G1 (see parse_line).
+            None: If the line is G92 or any other unhandled command.
+        """
+
+        # Debug messages are only formatted if they will be printed
+        debug = self.verbose >= GCodeProcessor.LOG_DEBUG
+
+        # Debugging output
+        if debug: self._log(GCodeProcessor.LOG_DEBUG, "Parsing line: '{}'".format(cleaned_line))
 
         # Parse command and parameters
         parts = cleaned_line.split()
         if not parts: return None
 
-        # Extract the command and parameters into a dictionary
-        command = parts[0].upper()
-        raw_params = {}
-        try:
-            for part in parts[1:]:
-                part = part.strip()
-                if len(part) >= 2:
-                    param_code = part[0].upper()
-                    if 'A' <= param_code <= 'Z':
-                        param_value = float(part[1:])
-                        raw_params[param_code] = param_value
-                        self._log(GCodeProcessor.LOG_DEBUG,"  -> Parsed raw param: {} = {}".format(param_code, param_value))
-
-        # Handle any parsing errors
-        # This may happen if the G-code line is malformed or contains unexpected characters
-        # For example, if a parameter is not a number or is missing
-        except ValueError as e:
-            self._log(GCodeProcessor.LOG_WARN, "Warning: Value parse error in '{}'. Error: {}. Skipping part.".format(cleaned_line, e))
+        # Skip commands that are not handled before parsing any of their parameters
+        # Slicer output is upper case, so upper() is only needed if the command is not found directly
+        # The command is converted to its integer code
+        command = _COMMANDS.get(parts[0])
+        if command is None: command = _COMMANDS.get(parts[0].upper())
+        if command is None:
+            if debug: self._log(GCodeProcessor.LOG_DEBUG,"  -> Skipping unhandled/non-actionable command: {}".format(parts[0]))
+            return None
+
+        # Extract the parameters into local variables (None if not present)
+        # split() already strips whitespace from every token, so each token is <LETTER><number>
+        # Only the X, Y, Z and E parameters are used, so the others are skipped without parsing their value
+        # For G0/G1 the E value is only compared against the last E value to determine the extrusion state
+        x = y = z = e = None
+        extruding = False
+        is_move = command != GCodeProcessor.CMD_G92
+        param_codes_get = _PARAM_CODES.get
+        for i in range(1, len(parts)):
+            part = parts[i]
+            param_code = param_codes_get(part[0])
+            if param_code is None or len(part) < 2: continue
+            try:
+                param_value = GCodeProcessor._e_to_units(part[1:]) if param_code == 'E' else float(part[1:])
+
+            # Handle any parsing errors
+            # This may happen if the G-code line is malformed or contains unexpected characters
+            # For example, if a parameter is not a number
+            except ValueError as err:
+                self._log(GCodeProcessor.LOG_WARN, "Warning: Value parse error in '{}'. Error: {}. Skipping part.".format(cleaned_line, err))
+                continue
+            if debug: self._log(GCodeProcessor.LOG_DEBUG,"  -> Parsed raw param: {} = {}".format(param_code, param_value / GCodeProcessor.E_UNITS_PER_MM if param_code == 'E' else param_value))
+            if param_code == 'X': x = param_value
+            elif param_code == 'Y': y = param_value
+            elif param_code == 'Z': z = param_value
+            elif not is_move: e = param_value
+
+            # Extrusion happens if E is present and greater than the last E value
+            # If so, the last E value is updated to this new bigger value
+            elif param_value > self.last_e_value:
+                extruding = True
+                self.last_e_value = param_value
+                if debug: self._log(GCodeProcessor.LOG_DEBUG,"  -> Extrusion detected (last E: {})".format(param_value / GCodeProcessor.E_UNITS_PER_MM))
 
         # Handle movement commands (G0, G1)
-        if command in ('G0', 'G1'):
-            
-            # Initialize dictionary with mandatory fields
-            # The actual extrusion state will be determined later
-            parsed_data = {
-                'command': command,
-                'extruding': False
-            }
-
-            # Add X, Y, Z only if they exist in the command line
-            if 'X' in raw_params: parsed_data['X'] = raw_params['X']
-            if 'Y' in raw_params: parsed_data['Y'] = raw_params['Y']
-            if 'Z' in raw_params: parsed_data['Z'] = raw_params['Z']
-
-            # Get the E value from the command line if it exists
-            current_e = raw_params.get('E', None)
-            if current_e is not None:
-                
-                # Extrusion happens if E is present and greater than the last E value
-                if current_e > self.last_e_value:
-                    parsed_data['extruding'] = True
-                    
-                    # Update the last E value to this new bigger value
-                    self.last_e_value = current_e
-
-                    # Debugging output
-                    self._log(GCodeProcessor.LOG_DEBUG,"  -> Extrusion detected: {} (last E: {})".format(current_e, self.last_e_value))
+        if is_move:
+
+            # X, Y and Z are None if they do not exist in the command line
+            parsed_data = (command, extruding, x, y, z)
 
             # Debugging output
-            self._log(GCodeProcessor.LOG_DEBUG,"  -> Parsed G0/G1 Data: {}".format(parsed_data))
+            if debug: self._log(GCodeProcessor.LOG_DEBUG,"  -> Parsed G0/G1 Data: {}".format(parsed_data))
 
             # Return the parsed data
             return parsed_data
 
         # Handle G92 command (set position)
-        elif command == 'G92':
+        else:
 
-            # Get the E value from the command line if it exists
-            new_e = raw_params.get('E', None)
-            if new_e is not None:
+            # Check the E value from the command line if it exists
+            if e is not None:
 
                 # Debugging output
-                self._log(GCodeProcessor.LOG_INFO,"  Line {}: RESET -> G:92 E:{}".format(line_number, new_e))
-                self._log(GCodeProcessor.LOG_DEBUG,"  -> Resetting internal E tracker...".format(line_number, new_e))
+                self._log(GCodeProcessor.LOG_INFO,"  Line {}: RESET -> G:92 E:{}".format(line_number, e / GCodeProcessor.E_UNITS_PER_MM))
+                self._log(GCodeProcessor.LOG_DEBUG,"  -> Resetting internal E tracker...")
 
                 # Update the last E value to this new value
-                self.last_e_value = new_e
+                self.last_e_value = e
 
             # Do nothing if E is not present
             else:
-                 self._log(GCodeProcessor.LOG_DEBUG,"  Line {}: Parsed empty G92 (non-E params).".format(line_number))
+                 if debug: self._log(GCodeProcessor.LOG_DEBUG,"  Line {}: Parsed empty G92 (non-E params).".format(line_number))
 
             # Do not return G92
             return None
 
-        # If the command is not G0, G1, or G92, None is returned
-        else:
-            self._log(GCodeProcessor.LOG_DEBUG,"  -> Skipping unhandled/non-actionable command: {}".format(command))
-            return None
+# Commands handled by the parser, mapped to their integer code
+_COMMANDS = {'G0': GCodeProcessor.CMD_G0, 'G1': GCodeProcessor.CMD_G1, 'G92': GCodeProcessor.CMD_G92}
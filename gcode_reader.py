@@ -0,0 +1,159 @@
+import _thread
+
+from pybricks.tools import wait
+
+class GCodeReader:
+    """
+    Reads and parses a G-code file on a background thread, so that reading from the SD card and parsing
+    happen while the printer's motors are moving instead of in between moves.
+    Parsed commands are handed to the main loop through a small ring buffer (single producer, single consumer).
+    Comments, blank lines and non-G commands are dropped before parsing,
+    and only lines that produce an actionable command (see GCodeProcessor.parse_line) are queued.
+    Each queued move is resolved to an absolute target, both in millimeters and in motor degrees,
+    so the conversion is also done ahead of the printer. Axes missing from a line keep their previous value,
+    starting from the homed position (0, 0, 0).
+    The reader takes ownership of the file and closes it once reading has finished or is stopped.
+    If reading fails, the error is stored in the error attribute, so it can be told apart from the end of the file.
+    """
+
+    def __init__(self, processor, gcode_file, to_degrees, buffer_size: int = 32, read_size: int = 4096):
+        """
+        Initializes the GCodeReader. Reading starts when start() is called.
+
+        Args:
+            processor (GCodeProcessor): The processor used to parse each line.
+            gcode_file (file): An open G-code file to read from.
+            to_degrees (function): Converts an (x, y, z) position in millimeters to motor degrees (see Printer.mm_to_degrees).
+            buffer_size (int): The number of parsed commands that can be read ahead. Defaults to 32.
+            read_size (int): The number of characters read from the file at once. Defaults to 4096 (a common FAT cluster size).
+        """
+
+        # Initialize instance variables
+        self.processor = processor
+        self.gcode_file = gcode_file
+        self.to_degrees = to_degrees
+        self.buffer_size = buffer_size
+        self.read_size = read_size
+
+        # Ring buffer state
+        # The head is only written by the main loop and the tail only by the reader thread,
+        # so no lock is needed. One slot is kept empty to tell a full buffer from an empty one.
+        self._buffer = [None] * buffer_size
+        self._head = 0
+        self._tail = 0
+
+        # Reader state
+        self._done = False
+        self._stopped = False
+        self.error = None
+        self.line_count = 0
+        self.bytes_read = 0
+
+    def start(self):
+        """Starts reading and parsing the file on a background thread."""
+        _thread.start_new_thread(self._read, ())
+
+    def stop(self):
+        """Asks the reader thread to stop reading. Already queued commands are discarded."""
+        self._stopped = True
+
+    def _lines(self):
+        """
+        Yields the lines of the file without their line endings.
+        The file is read in blocks of read_size characters, so the SD card is accessed in a few large reads
+        instead of many small ones.
+        """
+        read = self.gcode_file.read
+        read_size = self.read_size
+        remainder = ''
+        while True:
+            block = read(read_size)
+            if not block: break
+
+            # The last part of the block may be an incomplete line, so keep it for the next block
+            lines = (remainder + block).split('\n')
+            remainder = lines.pop()
+            for line in lines: yield line
+
+        # The last line of the file may not end with a newline
+        if remainder: yield remainder
+
+    def _read(self):
+        """Reader thread: parses every line of the file and queues the actionable commands."""
+        clean_line = self.processor.clean_line
+        parse_command = self.processor.parse_command
+        to_degrees = self.to_degrees
+        buffer = self._buffer
+        size = self.buffer_size
+        line_count = 0
+        bytes_read = 0
+        tail = 0
+        x = y = z = 0.0
+
+        try:
+            for line in self._lines():
+                if self._stopped: break
+                line_count += 1
+                bytes_read += len(line) + 1
+
+                # Skip comments, blank lines and anything that is not a G command before parsing
+                if not line or line[0] in ';\r': continue
+                cleaned_line = clean_line(line)
+                if not cleaned_line or cleaned_line[0] not in 'Gg': continue
+
+                # Parse the line, skipping anything that is not a movement command
+                parsed_output = parse_command(cleaned_line, line_count)
+                if parsed_output is None: continue
+
+                # Wait for a free slot in the buffer
+                next_tail = (tail + 1) % size
+                while next_tail == self._head:
+                    if self._stopped: return
+                    wait(5)
+
+                # Resolve the target position, keeping the previous position for axes that are not in the line
+                command, extruding, parsed_x, parsed_y, parsed_z = parsed_output
+                if parsed_x is not None: x = parsed_x
+                if parsed_y is not None: y = parsed_y
+                if parsed_z is not None: z = parsed_z
+                x_deg, y_deg, z_deg = to_degrees(x, y, z)
+
+                # Queue the command along with the progress at this point of the file
+                buffer[tail] = (line_count, bytes_read, command, extruding, x, y, z, x_deg, y_deg, z_deg)
+                tail = next_tail
+                self._tail = tail
+
+        # Keep the error for the main loop, as exceptions are not passed on from the reader thread
+        except Exception as e:
+            self.error = e
+
+        # Always close the file and signal the end of the file to the main loop, even on errors
+        finally:
+            self.line_count = line_count
+            self.bytes_read = bytes_read
+            self.gcode_file.close()
+            self._done = True
+
+    def get(self):
+        """
+        Returns the next parsed command, waiting for the reader thread if needed.
+
+        Returns:
+            tuple: (line_number, bytes_read, command, extruding, x, y, z, x_deg, y_deg, z_deg),
+                   where the command and extrusion status are as returned by GCodeProcessor.parse_line,
+                   x, y, z is the absolute target in millimeters and x_deg, y_deg, z_deg the same target in motor degrees.
+            None: If the end of the file has been reached, the reader was stopped or reading failed (see error).
+        """
+        head = self._head
+
+        # Wait until a command is available
+        while head == self._tail:
+            # The tail is updated before the done flag, so check the tail again after seeing the flag
+            if self._done and head == self._tail: return None
+            wait(1)
+
+        # Take the command out of the buffer
+        item = self._buffer[head]
+        self._buffer[head] = None
+        self._head = (head + 1) % self.buffer_size
+        return item
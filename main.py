@@ -1,17 +1,25 @@
 #!/usr/bin/env pybricks-micropython
 
+import os
+
+from micropython import const
 from pybricks.parameters import Button
 from pybricks.tools import wait
 
 # Module imports
 from gcode_handler import GCodeProcessor
+from gcode_reader import GCodeReader
 from printer import Printer
 
 # Verbosity controls how much information is printed to the console
 # 0 = Only errors
 # 1 = Basic output
 # 2 = Detailed output
-VERBOSE = 0
+VERBOSE = const(0)
+
+# Debug output in the print loop
+# This is a compile-time constant, so MicroPython removes the debug code from the loop when VERBOSE is 0
+_DEBUG = const(VERBOSE)
 
 # Initialize the GCodeProcessor and Printer classes
 # The GCodeProcessor handles the parsing of G-code files
@@ -46,93 +54,117 @@ if available_files:
         if VERBOSE > 0: print("\nSelected file: {}".format(selected_file))
         full_path = selected_file if processor.models_dir == '.' else processor.models_dir + '/' + selected_file
 
-        # Try reading the G-code file
-        # If there is an error reading the file, exit
+        # Try opening the G-code file
+        # The file is streamed line by line during the print instead of being loaded into memory
+        # The GCodeReader closes the file once it is done reading
+        # If there is an error opening the file, exit
         try:
-            with open(full_path, 'r') as f:
-                lines = f.readlines()
+            total_bytes = os.stat(full_path)[6]
+            gcode_file = open(full_path, 'r')
         except OSError as e:
             print("\nError reading file '{}': {}".format(full_path, e))
             exit()
 
-        # Initialize printer state
-        current_x, current_y, current_z = 0.0, 0.0, 0.0
-
         # Prompt to prime the extruder
         printer.prime_extruder()
 
         # Auto Home
         printer.home()
-        current_x, current_y, current_z = 0.0, 0.0, 0.0
+
+        # Initialize printer state
+        # Only the position in millimeters for X and Y and in degrees for Z are needed by printer.move
+        current_x, current_y, current_z_deg = 0.0, 0.0, 0
 
         # Initialize main loop to print the G-code file
+        # Progress is tracked by the number of bytes read, so the file does not need a counting pass
         line_count = 0
-        total_lines = len(lines)
+        bytes_read = 0
+        total_bytes = max(1, total_bytes)
+        last_percentage = 0
         printer.draw_centered_text("Printing...", line=-1)
-        printer.draw_centered_text("{}%".format(int(line_count/total_lines*100)), False, 1)
-
-        # Loop through each line of the G-code file
-        # The line count is used to track the progress of the print
-        for line in lines:
-            line_count += 1
+        printer.draw_centered_text("{}%".format(last_percentage), False, 1)
+
+        # Start reading and parsing the G-code file in the background
+        # The GCodeReader parses each line using the GCodeProcessor while the printer is moving
+        # Valid commands are G0 and G1 (movement commands)
+        # G92 commands are handled by the GCodeProcessor but not returned (they are useful to determine whether to extrude or not)
+        # Moves are also converted to motor degrees by the reader, so the print loop does not need to
+        reader = GCodeReader(processor, gcode_file, printer.mm_to_degrees)
+        reader.start()
+
+        # Loop through each parsed command of the G-code file
+        # The line count is used for logging, the bytes read to track the progress of the print
+        command_count = 0
+        current_extruding = False
+        stopped = False
+        buttons_pressed = printer.ev3.buttons.pressed
+        while True:
+            next_command = reader.get()
+            if next_command is None: break
+            line_count, bytes_read, command, should_extrude, target_x, target_y, target_z, target_x_deg, target_y_deg, target_z_deg = next_command
+            command_count += 1
 
             # Stop the program if the center button is pressed
-            if printer.ev3.buttons.pressed() == [Button.CENTER]:
-                printer.draw_centered_text("Stopped.")
-                printer.ev3.speaker.beep()
-                while printer.ev3.buttons.pressed():
-                    wait(100)
+            # The buttons are only checked every 16 commands here, as printer.move also checks the center button while waiting
+            if command_count & 0xF == 0 and buttons_pressed() == [Button.CENTER]:
+                stopped = True
                 break
 
-            # Parse the line using the GCodeProcessor
-            # The parsed output contains the command and parameters
-            # Valid commands are G0 and G1 (movement commands)
-            # G92 commands are handled by the GCodeProcessor but not returned (they are useful to determine whether to extrude or not)
-            parsed_output = processor.parse_line(line, line_count)
-
-            # If the line is not empty and contains a valid command (G0/G1), execute it
-            if parsed_output:
-
-                # Retrieve the target coordinates and extrusion status
-                # If the coordinates are not present, use the current position
-                target_x = parsed_output.get('X', current_x)
-                target_y = parsed_output.get('Y', current_y)
-                target_z = parsed_output.get('Z', current_z)
-                should_extrude = parsed_output['extruding'] # Always present
-
-                # Debugging output
-                if VERBOSE > 0:
-                    print("  Line {}: MOVE -> ".format(line_count), end="")
-                    if 'X' in parsed_output: print("X:{:.3f} ".format(target_x), end="")
-                    if 'Y' in parsed_output: print("Y:{:.3f} ".format(target_y), end="")
-                    if 'Z' in parsed_output: print("Z:{:.3f} ".format(target_z), end="")
-                    print("Extruding:{}".format(should_extrude))
-
-                # Control Extruder (Pen ON)
-                if should_extrude: printer.extrude(should_extrude)
-
-                # Move to the target position
-                printer.move(target_x, target_y, target_z, current_x, current_y, current_z, command=parsed_output['command'])
-
-                # Control Extruder (Pen OFF)
-                if not should_extrude: printer.extrude(should_extrude)
-
-                # Update current position state after move
-                current_x = target_x
-                current_y = target_y
-                current_z = target_z
-
-                # Update progress display only if not extruding, to avoid delays
-                if not should_extrude:
-                    printer.draw_centered_text("Printing...", line=-1)
-                    printer.draw_centered_text("{}%".format(int(line_count/total_lines*100)), False, 1)                        
-        
+            # Debugging output
+            if _DEBUG:
+                print("  Line {}: MOVE -> X:{:.3f} Y:{:.3f} Z:{:.3f} Extruding:{}".format(line_count, target_x, target_y, target_z, should_extrude))
+
+            # Control Extruder (Pen ON), only if it is not on already
+            if should_extrude and not current_extruding:
+                printer.extrude(True)
+                current_extruding = True
+
+            # Move to the target position
+            # Stop the program if the center button was pressed while waiting for the previous move
+            if printer.move(target_x_deg, target_y_deg, target_z_deg, current_z_deg, target_x, target_y, current_x, current_y, command=command):
+                stopped = True
+                break
+
+            # Control Extruder (Pen OFF), only if it is not off already
+            if not should_extrude and current_extruding:
+                printer.extrude(False)
+                current_extruding = False
+
+            # Update current position state after move
+            current_x = target_x
+            current_y = target_y
+            current_z_deg = target_z_deg
+
+            # Update progress display only if not extruding, to avoid delays
+            # Only the percentage is redrawn, and only when it has changed
+            if not should_extrude:
+                percentage = bytes_read * 100 // total_bytes
+                if percentage != last_percentage:
+                    last_percentage = percentage
+                    printer.draw_centered_text("{}%".format(percentage), False, 1)
+
+        # Stop reading and wait for the center button to be released if the print was stopped
+        if stopped:
+            reader.stop()
+            printer.draw_centered_text("Stopped.")
+            printer.ev3.speaker.beep()
+            while buttons_pressed():
+                wait(100)
+
         # Ensure extruder is off after the print is finished
         printer.extrude(False)
 
+        # If there was an error reading the file, the print is not complete, so exit
+        if reader.error is not None:
+            print("\nError reading file '{}': {}".format(full_path, reader.error))
+            printer.draw_centered_text("Error reading file.")
+            printer.ev3.speaker.beep()
+            while not buttons_pressed(): wait(100)
+            exit()
+
         # Display completion message
         if VERBOSE > 0: print("\nFinished processing file '{}'.".format(selected_file))
-        if VERBOSE > 1: print("Total lines read: {}/{}".format(line_count,total_lines))
+        if VERBOSE > 1: print("Total lines read: {} ({}/{} bytes)".format(reader.line_count, reader.bytes_read, total_bytes))
 
         # Move the extruder out of the way
         printer.present_print()
@@ -1,10 +1,12 @@
 from pybricks.hubs import EV3Brick
 from pybricks.ev3devices import Motor, TouchSensor
-from pybricks.parameters import Port, Stop, Direction, Button
+from pybricks.parameters import Port, Stop, Direction, Button, Color
 from pybricks.media.ev3dev import Font
 from pybricks.tools import wait
 from math import sqrt
 
+from gcode_handler import GCodeProcessor
+
 class Printer:
     """
     A class to manage the printer's display and control its motors and sensors.
@@ -52,6 +54,18 @@ class Printer:
         self.y_limit = 141
         self.z_limit = 152
 
+        # Degrees per millimeter and positions in degrees, derived from the values above
+        # These are precomputed so that moving only needs multiplications instead of divisions
+        self.x_deg_per_mm = 1.0 / self.x_mm_per_degree
+        self.y_deg_per_mm = 1.0 / self.y_mm_per_degree
+        self.z_deg_per_mm = 1.0 / self.z_mm_per_degree
+        self.y_limit_deg = self.y_limit * self.y_deg_per_mm
+        self.z_limit_deg = self.z_limit * self.z_deg_per_mm
+
+        # XY speeds for printing (G1) and rapid (G0) moves, derived from the values above
+        self._g1_speed = self.xy_speed
+        self._g0_speed = self.xy_speed * self.max_xy_speed_multiplier
+
         # Multiplier for acceleration
         # This is used to increase the acceleration of the motors and achieve more linear movements
         # This ensures consistent extrusion and better print quality
@@ -120,11 +134,24 @@ class Printer:
         self.font = Font(size=self.font_size, bold=False)
         self.screen.set_font(self.font)
 
+        # Cache of text widths in pixels, keyed by text
+        # Only a handful of different texts are drawn, so the cache is simply emptied when it grows too large
+        self._text_width_cache = {}
+        self._text_width_cache_size = 32
+
+        # Text currently on the screen per line, as (text, x, y, width)
+        # This is used to only redraw the part of the screen that changes
+        self._drawn_text = {}
+
         # Initialize printer state
         self.extruding = False
 
+        # Whether the X and Y motors were started by the last move and may still be moving
+        self._x_moving = False
+        self._y_moving = False
+
         # Start with a clear screen
-        self.screen.clear()
+        self._clear_screen()
 
         # Debug message for initialization
         self._log(Printer.LOG_INFO, "Printer initialized.")
@@ -134,6 +161,24 @@ class Printer:
         if self.verbose >= level:
             print(message)
 
+    def _dlog(self, *messages):
+        """Internal debug logging function that prints several messages with a single print call."""
+        if self.verbose >= Printer.LOG_DEBUG:
+            print("\n".join(messages))
+
+    def _clear_screen(self):
+        """Clears the screen and forgets the text drawn on it."""
+        self.screen.clear()
+        self._drawn_text.clear()
+
+    def _wait_for_buttons(self):
+        """Waits until any button is pressed and returns the list of pressed buttons."""
+        buttons = self.ev3.buttons
+        while True:
+            pressed_buttons = buttons.pressed()
+            if pressed_buttons: return pressed_buttons
+            wait(100)
+
     def file_selector(self, available_files: list):
         """
         Displays a file selector on the EV3 screen for G-code files.
@@ -148,22 +193,21 @@ class Printer:
             self.draw_centered_text(file_name, False)
 
         selected_file_index = 0
+        last_file_index = len(available_files) - 1
+        buttons = self.ev3.buttons
         draw_file(available_files[selected_file_index])
         while True:
             # Wait for button press
-            while not self.ev3.buttons.pressed(): wait(100)
-            pressed_buttons = self.ev3.buttons.pressed()
-            
+            pressed_buttons = self._wait_for_buttons()
+
             if Button.LEFT in pressed_buttons:
-                # Move to the previous file
-                selected_file_index = (selected_file_index - 1) % len(available_files)
+                # Move to the previous file, wrapping around to the last file
+                selected_file_index = last_file_index if selected_file_index == 0 else selected_file_index - 1
                 draw_file(available_files[selected_file_index])
-                while self.ev3.buttons.pressed(): wait(100)
             elif Button.RIGHT in pressed_buttons:
-                # Move to the next file
-                selected_file_index = (selected_file_index + 1) % len(available_files)
+                # Move to the next file, wrapping around to the first file
+                selected_file_index = 0 if selected_file_index == last_file_index else selected_file_index + 1
                 draw_file(available_files[selected_file_index])
-                while self.ev3.buttons.pressed(): wait(100)
             elif Button.CENTER in pressed_buttons:
                 # Select the current file
                 self.draw_centered_text("Selected:", line=-2)
@@ -171,13 +215,18 @@ class Printer:
                 self.ev3.speaker.beep(750, 50)
                 wait(50)
                 self.ev3.speaker.beep(1000, 50)
-                while self.ev3.buttons.pressed(): wait(100)
+                while buttons.pressed(): wait(100)
                 return selected_file_index
 
+            # Wait for the buttons to be released
+            while buttons.pressed(): wait(100)
+
     def draw_centered_text(self, text: str, do_clear: bool = True, line: int = 0):
         """
         Clears the screen and draws the provided text string centered
         both horizontally and vertically on the EV3 display.
+        Without clearing, only the text previously drawn on the same line is erased,
+        and nothing is drawn if that text is unchanged.
 
         Args:
             text (str): The string message to display.
@@ -186,19 +235,30 @@ class Printer:
             line (int): The line number to display the text on
                     Negative is above center, positive is below center.
         """
-        # 1. Clear the screen before drawing new text
-        if do_clear: self.screen.clear()
+        # 1. Clear the screen, or only the previous text on this line, before drawing new text
+        if do_clear:
+            self._clear_screen()
+        else:
+            previous = self._drawn_text.get(line)
+            if previous is not None:
+                if previous[0] == text: return
+                _, prev_x, prev_y, prev_width = previous
+                self.screen.draw_box(prev_x, prev_y, prev_x + prev_width, prev_y + self.font.height, fill=True, color=Color.WHITE)
 
         # 2. Get screen dimensions
         screen_width = self.screen.width  # Typically 178 pixels
         screen_height = self.screen.height # Typically 128 pixels
 
-        # 3. Calculate text dimensions using the current font
-        try:
-            text_width_pixels = self.font.text_width(text)
-        except Exception as e:
-            self._log(Printer.LOG_WARN, "Warning: Could not get text dimensions: {}".format(e))
-            text_width_pixels = len(text) * 8 # Rough estimate
+        # 3. Calculate text dimensions using the current font, unless they are cached
+        text_width_pixels = self._text_width_cache.get(text)
+        if text_width_pixels is None:
+            try:
+                text_width_pixels = self.font.text_width(text)
+            except Exception as e:
+                self._log(Printer.LOG_WARN, "Warning: Could not get text dimensions: {}".format(e))
+                text_width_pixels = len(text) * 8 # Rough estimate
+            if len(self._text_width_cache) >= self._text_width_cache_size: self._text_width_cache.clear()
+            self._text_width_cache[text] = text_width_pixels
 
         # 4. Calculate top-left coordinates (x, y) for centering
         x = (screen_width - text_width_pixels) // 2
@@ -210,7 +270,8 @@ class Printer:
 
         # 5. Draw the text at the calculated position
         self.screen.draw_text(x, y, text)
-        self._log(Printer.LOG_DEBUG, "Drew text: '{}' at ({}, {})".format(text, x, y))
+        self._drawn_text[line] = (text, x, y, text_width_pixels)
+        if self.verbose >= Printer.LOG_DEBUG: self._log(Printer.LOG_DEBUG, "Drew text: '{}' at ({}, {})".format(text, x, y))
 
     def _start_extruding(self):
         """
@@ -270,72 +331,123 @@ class Printer:
         dx = target_x - current_x
         dy = target_y - current_y
 
-        # Calculate the distance to the target
-        distance = sqrt(dx*dx + dy*dy)
-
-        # If the distance is very small, return (0, 0) to indicate no movement needed
-        if distance < 0.05:
+        # If the distance is very small (below 0.05), return (0, 0) to indicate no movement needed
+        # The squared distance is compared, so no square root is needed for this check
+        distance_squared = dx*dx + dy*dy
+        if distance_squared < 0.0025:
             return (0.0, 0.0)
 
-        # Normalize the direction vector and scale by speed
-        inv_distance = 1.0 / distance
-        vx = dx * inv_distance * target_speed
-        vy = dy * inv_distance * target_speed
+        # Scale the direction vector to the target speed
+        # The speed is divided by the distance once, instead of normalizing and scaling separately
+        scale = target_speed / sqrt(distance_squared)
 
-        # If the speed is very small, set it to 0
-        if abs(dx) < 0.05: vx = 0
-        if abs(dy) < 0.05: vy = 0
+        # If the difference along an axis is very small, set its speed to 0
+        vx = 0.0 if -0.05 < dx < 0.05 else dx * scale
+        vy = 0.0 if -0.05 < dy < 0.05 else dy * scale
 
         # Return the velocity components
         return (vx, vy)
 
-    def move(self, x: float, y: float, z: float, prev_x: float, prev_y: float, prev_z: float, command: str = "G1"):
+    def mm_to_degrees(self, x: float, y: float, z: float):
         """
-        Moves the printer to the specified coordinates (x, y, z).
+        Converts a position in millimeters to motor angles in degrees.
 
         Args:
-            x (float): Target X coordinate.
-            y (float): Target Y coordinate.
-            z (float): Target Z coordinate.
-            prev_x (float): Previous X coordinate.
-            prev_y (float): Previous Y coordinate.
-            prev_z (float): Previous Z coordinate.
-            command (str): The G-code command (G0 or G1). Defaults to "G1".
+            x (float): X coordinate in millimeters.
+            y (float): Y coordinate in millimeters.
+            z (float): Z coordinate in millimeters.
+
+        Returns:
+            A tuple (x, y, z) of motor angles in whole degrees.
         """
-        # Debugging output
-        self._log(Printer.LOG_INFO, "  -> Target (mm): ({:.3f}, {:.3f}, {:.3f})".format(x, y, z))
+        return (int(x * self.x_deg_per_mm), int(y * self.y_deg_per_mm), int(z * self.z_deg_per_mm))
 
-        # Determine motor speeds
-        if command == "G1": x_speed, y_speed = self._calculate_velocity_components(prev_x, prev_y, x, y, self.xy_speed)
-        elif command == "G0": x_speed, y_speed = self._calculate_velocity_components(prev_x, prev_y, x, y, self.xy_speed*self.max_xy_speed_multiplier)
+    def move(self, x_deg: int, y_deg: int, z_deg: int, prev_z_deg: int, x: float, y: float, prev_x: float, prev_y: float, command: int = GCodeProcessor.CMD_G1):
+        """
+        Moves the printer to the specified coordinates.
+        The target is given in degrees (see mm_to_degrees), so it can be converted ahead of time.
+        The X and Y coordinates in millimeters are only used to determine the direction of the move.
+
+        Args:
+            x_deg (int): Target X motor angle in degrees.
+            y_deg (int): Target Y motor angle in degrees.
+            z_deg (int): Target Z motor angle in degrees.
+            prev_z_deg (int): Previous Z motor angle in degrees.
+            x (float): Target X coordinate in millimeters.
+            y (float): Target Y coordinate in millimeters.
+            prev_x (float): Previous X coordinate in millimeters.
+            prev_y (float): Previous Y coordinate in millimeters.
+            command (int): The G-code command (GCodeProcessor.CMD_G0 or GCodeProcessor.CMD_G1). Defaults to GCodeProcessor.CMD_G1.
 
-        # Convert to degrees
-        x = int(x / self.x_mm_per_degree)
-        y = int(y / self.y_mm_per_degree)
-        z = int(z / self.z_mm_per_degree)
+        Returns:
+            bool: True if the center button was pressed while waiting for the previous move, in which case no new move is started.
+        """
+        # Debugging output
+        # Messages are only formatted if they will be printed
+        info = self.verbose >= Printer.LOG_INFO
+        debug = self.verbose >= Printer.LOG_DEBUG
+        if info: self._log(Printer.LOG_INFO, "  -> Target (mm): ({:.3f}, {:.3f})".format(x, y))
 
-        # Log the calculated values
-        self._log(Printer.LOG_DEBUG, "  -> Calculated speeds (degrees/s): (X:{:.3f}, Y:{:.3f})".format(x_speed, y_speed))
-        self._log(Printer.LOG_DEBUG, "  -> Target (degrees): ({:.3f}, {:.3f}, {:.3f})".format(x, y, z))
+        # Determine motor speeds
+        # Moves along a single axis (common in perimeters and infill) get the full speed on that axis directly
+        speed = self._g0_speed if command == GCodeProcessor.CMD_G0 else self._g1_speed
+        dx = x - prev_x
+        dy = y - prev_y
+        if -0.05 < dy < 0.05:
+            x_speed = 0.0 if -0.05 < dx < 0.05 else (speed if dx > 0 else -speed)
+            y_speed = 0.0
+        elif -0.05 < dx < 0.05:
+            x_speed = 0.0
+            y_speed = speed if dy > 0 else -speed
+        else:
+            x_speed, y_speed = self._calculate_velocity_components(prev_x, prev_y, x, y, speed)
 
         # If the target Z is higher than the previous Z, move up first
-        if z > prev_z:
-            self.z_motor.run_target(self.z_speed, z, then=Stop.BRAKE, wait=True)
-
-        # Wait for motors to finish previous tasks
-        while not (self.x_motor.control.done() and self.y_motor.control.done()) and not Button.CENTER in self.ev3.buttons.pressed(): wait(5)
+        # Moving up is away from the print, so this is started without waiting and overlaps with the previous move
+        z_moving = z_deg > prev_z_deg
+        if z_moving:
+            self.z_motor.run_target(self.z_speed, z_deg, then=Stop.BRAKE, wait=False)
+
+        # Wait for motors to finish previous tasks (and moving Z up)
+        # Only the motors that were started by the previous move need to be checked
+        # The motors and their methods are stored in local variables, as attribute lookups are slow in MicroPython
+        x_motor = self.x_motor
+        y_motor = self.y_motor
+        x_done = x_motor.control.done
+        y_done = y_motor.control.done
+        z_done = self.z_motor.control.done
+        buttons_pressed = self.ev3.buttons.pressed
+        x_moving = self._x_moving
+        y_moving = self._y_moving
+        while True:
+            if (not x_moving or x_done()) and (not y_moving or y_done()) and (not z_moving or z_done()): break
+            if Button.CENTER in buttons_pressed(): return True
+            wait(10)
 
         # Move in XY plane if the movement is significant
-        if abs(x_speed) > 2 and abs(self.x_motor.angle()-x) > 2:
-            self._log(Printer.LOG_DEBUG, "    -> Moving X-axis to {} degrees.".format(x))
-            self.x_motor.run_target(x_speed, x, then=Stop.HOLD, wait=False)
-        if abs(y_speed) > 2 and abs(self.y_motor.angle()-y) > 2:
-            self._log(Printer.LOG_DEBUG, "    -> Moving Y-axis to {} degrees.".format(y))
-            self.y_motor.run_target(y_speed, y, then=Stop.HOLD, wait=False)
+        x_moving = abs(x_speed) > 2 and abs(x_motor.angle()-x_deg) > 2
+        if x_moving:
+            x_motor.run_target(x_speed, x_deg, then=Stop.HOLD, wait=False)
+        y_moving = abs(y_speed) > 2 and abs(y_motor.angle()-y_deg) > 2
+        if y_moving:
+            y_motor.run_target(y_speed, y_deg, then=Stop.HOLD, wait=False)
+        self._x_moving = x_moving
+        self._y_moving = y_moving
+
+        # Log the calculated values and started motors
+        # These are printed at once, so the console is only written to once per move
+        if debug:
+            messages = ["  -> Calculated speeds (degrees/s): (X:{:.3f}, Y:{:.3f})".format(x_speed, y_speed),
+                        "  -> Target (degrees): ({}, {}, {})".format(x_deg, y_deg, z_deg)]
+            if x_moving: messages.append("    -> Moving X-axis to {} degrees.".format(x_deg))
+            if y_moving: messages.append("    -> Moving Y-axis to {} degrees.".format(y_deg))
+            self._dlog(*messages)
 
         # If the target Z is lower than the previous Z, move down last
-        if z < prev_z:
-            self.z_motor.run_target(self.z_speed, z, then=Stop.BRAKE, wait=True)
+        # This waits for the move to finish, so the nozzle does not move down during any following travel
+        if z_deg < prev_z_deg:
+            self.z_motor.run_target(self.z_speed, z_deg, then=Stop.BRAKE, wait=True)
+        return False
 
     def prime_extruder(self):
         """
@@ -347,10 +459,10 @@ class Printer:
         self.draw_centered_text("YES            NO", False, 1)
 
         # Wait for button press
-        while not self.ev3.buttons.pressed(): wait(100)
+        pressed_buttons = self._wait_for_buttons()
 
         # Prime the extruder if the user presses the right button
-        if Button.RIGHT in self.ev3.buttons.pressed():
+        if Button.RIGHT in pressed_buttons:
             self._log(Printer.LOG_INFO, "  -> Priming Extruder...")
 
             # Press the extruder button once
@@ -358,14 +470,17 @@ class Printer:
             self._stop_extruding()
 
             # Wait for 35 seconds to prime the extruder, updating the display with the countdown
+            # The header is drawn once, after which only the countdown line changes
+            self.draw_centered_text("Heating Nozzle...", line=-1)
+            buttons = self.ev3.buttons
             for i in range(self.wait_time):
-                self.draw_centered_text("Heating Nozzle...", line=-1)
                 self.draw_centered_text("{} seconds left".format(self.wait_time - i), False, 1)
                 wait(1000)
-                if Button.CENTER in self.ev3.buttons.pressed():
+                if Button.CENTER in buttons.pressed():
                     break
         
         # Ensure the extruder is turned off if the user presses any other button
+        # This is done even though the extruder has not been started yet, as it moves the extruder motor to its known retracted position
         else:
             self._stop_extruding()
 
@@ -373,7 +488,7 @@ class Printer:
         self._log(Printer.LOG_DEBUG, "  -> Extruder primed.")
         self.draw_centered_text("Extruder primed.")
         wait(1000)
-        self.screen.clear()
+        self._clear_screen()
 
     def home(self):
         """
@@ -399,19 +514,21 @@ class Printer:
             motor.run(-2.5 * self.xy_speed)
 
             # Wait until the sensor is pressed
-            while not sensor.pressed():
-                wait(5)
+            # Precision is not needed yet, as the back-off below is much larger than the distance moved in 20ms
+            sensor_pressed = sensor.pressed
+            while not sensor_pressed():
+                wait(20)
 
             # Move back a little for a second touch
-            motor.brake()
+            # The new command replaces the running one, so the motor does not need to be stopped first
             motor.run_angle(self.xy_speed, 45, then=Stop.BRAKE, wait=True)
 
             # Move towards the sensor again, slowly
             motor.run(-0.5 * self.xy_speed)
 
-            # Wait until the sensor is pressed
-            while not sensor.pressed():
-                wait(5)
+            # Wait until the sensor is pressed, checking often as this touch determines the home position
+            while not sensor_pressed():
+                wait(2)
 
             # Stop the motor
             motor.hold()
@@ -431,22 +548,24 @@ class Printer:
         def home_z(motor, sensor):
 
             # Move towards the sensor
+            # The Z-axis moves fast and backs off only a little, so it keeps checking every 5ms here
             motor.run(-self.z_speed)
 
             # Wait until the sensor is pressed
-            while not sensor.pressed():
+            sensor_pressed = sensor.pressed
+            while not sensor_pressed():
                 wait(5)
 
             # Move back a little for a second touch
-            motor.brake()
+            # The new command replaces the running one, so the motor does not need to be stopped first
             motor.run_angle(self.z_speed, 8, then=Stop.BRAKE, wait=True)
 
             # Move towards the sensor again, slowly
             motor.run(-0.25 * self.z_speed)
 
-            # Wait until the sensor is pressed
-            while not sensor.pressed():
-                wait(5)
+            # Wait until the sensor is pressed, checking often as this touch determines the home position
+            while not sensor_pressed():
+                wait(2)
             
             # Stop the motor
             motor.hold()
@@ -478,27 +597,33 @@ class Printer:
         self.y_motor.brake()
         self.z_motor.brake()
 
+        # Move the Z-axis 10mm up to a position above the print, but within the limits
+        # This is started first, so it moves while the message is shown and the sound plays
+        z_position = min(self.z_motor.angle() + 10 * self.z_deg_per_mm, self.z_limit_deg)
+        self.z_motor.run_target(self.z_speed, z_position, then=Stop.BRAKE, wait=False)
+
         # Display a message and make a sound indicating the end of the print
         self.draw_centered_text("Print complete!", line = -1)
         self.ev3.speaker.beep(750, 50)
         wait(50)
         self.ev3.speaker.beep(1000, 50)
 
-        # Move the Z-axis 10mm up to a position above the print, but within the limits
-        z_position = min(self.z_motor.angle() + (10 / self.z_mm_per_degree), self.z_limit / self.z_mm_per_degree)
-        self.z_motor.run_target(self.z_speed, z_position, then=Stop.BRAKE, wait=True)
+        # Wait for the Z-axis to finish before moving the bed
+        z_done = self.z_motor.control.done
+        while not z_done(): wait(10)
         self._log(Printer.LOG_DEBUG, "  -> Moved Z-axis to {} degrees.".format(z_position))
         self._log(Printer.LOG_DEBUG, "  -> Moved Z-axis to {} mm.".format(z_position * self.z_mm_per_degree))
 
-        # Move the X-axis to its zero position
-        self.x_motor.run_target(self.max_xy_speed_multiplier * self.xy_speed, 0, then=Stop.BRAKE, wait=True)
-        self._log(Printer.LOG_DEBUG, "  -> Moved X-axis")
-
-        # Move the Y-axis to its limit position
-        self.y_motor.run_target(self.max_xy_speed_multiplier * self.xy_speed, self.y_limit / self.y_mm_per_degree, then=Stop.BRAKE, wait=True)
-        self._log(Printer.LOG_DEBUG, "  -> Moved Y-axis")
+        # Move the X-axis to its zero position and the Y-axis to its limit position
+        # Both axes are independent, so they move at the same time
+        self.x_motor.run_target(self._g0_speed, 0, then=Stop.BRAKE, wait=False)
+        self.y_motor.run_target(self._g0_speed, self.y_limit_deg, then=Stop.BRAKE, wait=False)
+        x_done = self.x_motor.control.done
+        y_done = self.y_motor.control.done
+        while not (x_done() and y_done()): wait(20)
+        self._log(Printer.LOG_DEBUG, "  -> Moved X-axis and Y-axis")
 
         # Wait for the user to press a button to exit
         self.draw_centered_text("Press any button to exit.", False, 1)
-        while not self.ev3.buttons.pressed(): wait(100)
-        self.screen.clear()
\ No newline at end of file
+        self._wait_for_buttons()
+        self._clear_screen()
\ No newline at end of file